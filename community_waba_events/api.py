@@ -5,7 +5,22 @@ from typing import Optional
 
 import frappe
 from frappe.model.document import Document
-from frappe.utils import cint
+from frappe.utils import cint, get_build_version, get_datetime
+from werkzeug.wrappers import Response
+
+from community_waba_events import __version__ as app_version
+from community_waba_events import replica
+from community_waba_events.replica import read_only
+from community_waba_events.community_waba_events.doctype.community_event_activity_score_rollup.community_event_activity_score_rollup import (
+    GRANULARITIES as ROLLUP_GRANULARITIES,
+)
+
+SCANNER_ASSETS = (
+    "/assets/community_waba_events/js/html5-qrcode.min.js",
+    "/assets/community_waba_events/js/qr_scanner.js",
+    "/assets/community_waba_events/css/scan-contact.css",
+    "/assets/community_waba_events/css/community-event-page.css",
+)
 
 
 @frappe.whitelist(allow_guest=False)
@@ -30,6 +45,27 @@ def share_contact():
     return doc
 
 
+@frappe.whitelist(allow_guest=True)
+def scanner_service_worker():
+    """service worker that precaches the qr scanner library and styles
+
+    the cache name is tied to the app and asset build versions, so a release or
+    a rebuilt asset busts old caches. pages are never cached, they carry the
+    session user's navbar and csrf token"""
+    script = frappe.render_template(
+        "community_waba_events/templates/scanner_sw.js",
+        {
+            "version": f"{app_version}-{get_build_version()}",
+            "assets": list(SCANNER_ASSETS),
+        },
+    )
+    response = Response(script, mimetype="application/javascript")
+    # served from /api/method, so the scope has to be widened explicitly
+    response.headers["Service-Worker-Allowed"] = "/"
+    response.headers["Cache-Control"] = "no-cache"
+    return response
+
+
 def vcard_esc(text: str) -> str:
     """helper to escape characters per vCard rules"""
     if not text:
@@ -88,6 +124,14 @@ def create_social_activity_score(virtual_id, for_virtual_id: Optional[str] = Non
         return None
 
 
+# a virtual id shared seconds ago may not have reached the replica yet
+@read_only(retry_on_primary=frappe.DoesNotExistError)
+def get_share_contact(virtual_id: str):
+    """the read half of view_contact, the virtual id and the user it belongs to"""
+    doc = frappe.get_doc("Virtual ID", virtual_id)
+    return doc, frappe.get_doc("User", doc.owner)
+
+
 @frappe.whitelist(allow_guest=True)
 def view_contact():
     """downloads contact vcf file for contact with"""
@@ -96,13 +140,13 @@ def view_contact():
     if not virtual_id:
         raise frappe.ValidationError("virtual_id required")
 
-    doc = frappe.get_doc("Virtual ID", virtual_id)
+    doc, user = get_share_contact(virtual_id)
+
     if doc.context != "share_contact":
         raise frappe.ValidationError(
             "contact viewing not permitted for this virtual id"
         )
 
-    user = frappe.get_doc("User", doc.owner)
     first = (user.get("first_name") or "").strip()
     last = (user.get("last_name") or "").strip()
     phone = (user.get("mobile_no") or "").strip() or (user.get("phone") or "").strip()
@@ -110,6 +154,7 @@ def view_contact():
     if not (first or last or phone):
         raise frappe.ValidationError("No contact information available for linked user")
 
+    # the score is written on the primary
     score_doc = create_social_activity_score(
         doc, frappe.form_dict.get("for_virtual_id")
     )
@@ -191,7 +236,55 @@ def get_participant_score(event: str, participant: str):
     return out[0] if out else frappe._dict()
 
 
+def get_all_participant_scores(event: str):
+    """leaderboard standing of every participant in the event, in a single pass
+
+    participants without a score get zeros, like the leaderboard endpoint"""
+    return frappe.db.sql(
+        """
+        WITH user_totals AS (
+        SELECT
+            participant,
+            SUM(score) AS total_score
+        FROM `tabCommunity Event Activity Score`
+        WHERE event = %(event)s
+        GROUP BY participant
+        ),
+        ranked AS (
+        SELECT
+            participant,
+            total_score,
+            DENSE_RANK() OVER (ORDER BY total_score DESC) AS position,
+            CUME_DIST() OVER (ORDER BY total_score) AS cume_dist
+        FROM user_totals
+        )
+        SELECT
+        p.name AS participant,
+        p.community_user,
+        COALESCE(r.total_score, 0) AS total_score,
+        COALESCE(r.position, 0) AS position,
+        COALESCE(ROUND(r.cume_dist * 100, 2), 0) AS percentile,
+        top.highest_score,
+        top.participants
+        FROM `tabCommunity Event Participant` AS p
+        LEFT JOIN ranked AS r
+            ON r.participant = p.name
+        CROSS JOIN (
+            SELECT
+            COALESCE(MAX(total_score), 0) AS highest_score,
+            COUNT(*) AS participants
+            FROM user_totals
+        ) AS top
+        WHERE p.community_event = %(event)s
+        ORDER BY p.name;
+        """,
+        {"event": event},
+        as_dict=1,
+    )
+
+
 @frappe.whitelist(allow_guest=False)
+@read_only(read_your_writes=True)
 def leaderboard():
     """community event activity leaderboard"""
 
@@ -220,6 +313,61 @@ def leaderboard():
     return score
 
 
+@frappe.whitelist(allow_guest=False)
+@read_only(read_your_writes=True)
+def activity_trend(
+    event: str,
+    participant: Optional[str] = None,
+    granularity: str = "Hour",
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+):
+    """score per minute/hour/day bucket for an event, or a single participant
+
+    reads the rollup table, so cost follows the number of buckets in range"""
+    if not event:
+        raise frappe.ValidationError("event required")
+    if granularity not in ROLLUP_GRANULARITIES:
+        raise frappe.ValidationError(
+            f"granularity must be one of {', '.join(ROLLUP_GRANULARITIES)}"
+        )
+
+    if not current_user_is_event_admin(event):
+        own = frappe.db.get_value(
+            "Community Event Participant",
+            {"community_event": event, "community_user": frappe.session.user},
+        )
+        if not own or (participant and participant != own):
+            frappe.throw(f"User is not an admin for event {event=!r}")
+        participant = own
+
+    conditions = ["event = %(event)s", "granularity = %(granularity)s"]
+    conditions.append(
+        "participant = %(participant)s" if participant else "participant IS NULL"
+    )
+    if start:
+        conditions.append("bucket >= %(start)s")
+    if end:
+        conditions.append("bucket <= %(end)s")
+
+    return frappe.db.sql(
+        f"""
+        SELECT bucket, score, entries
+        FROM `tabCommunity Event Activity Score Rollup`
+        WHERE {" AND ".join(conditions)}
+        ORDER BY bucket
+        """,
+        {
+            "event": event,
+            "granularity": granularity,
+            "participant": participant,
+            "start": get_datetime(start) if start else None,
+            "end": get_datetime(end) if end else None,
+        },
+        as_dict=1,
+    )
+
+
 def current_user_is_event_admin(event: str):
     """ensure current user is an event admin, or Administrator"""
     user = frappe.session.user
@@ -235,6 +383,7 @@ def current_user_is_event_admin(event: str):
 
 
 @frappe.whitelist(allow_guest=False)
+@read_only()
 def get_events():
     """Return events that include current user as admin"""
 
@@ -257,6 +406,7 @@ def get_events():
 
 
 @frappe.whitelist(allow_guest=False)
+@read_only()
 def get_event(event: str):
     """get specific event"""
     if not event:
@@ -304,6 +454,108 @@ def verify_participant(event: str, virtual_id: str):
     return {"ok": True, "data": frappe.db.get_value("User", user, "full_name")}
 
 
+def get_item_totals(event: str, participant: str, ptype: str, items: list):
+    """receipts per item for the participant, and for the participant type in the event"""
+    totals = {item: frappe._dict(user_total=0, event_total=0) for item in items}
+    if not items:
+        return totals
+    rows = frappe.db.sql(
+        """SELECT
+        r.item,
+        COALESCE(SUM(CASE WHEN r.participant = %(participant)s THEN 1 ELSE 0 END), 0) AS user_total,
+        COALESCE(SUM(CASE WHEN COALESCE(p.participant_type, "") = %(ptype)s THEN 1 ELSE 0 END), 0) AS event_total
+        FROM `tabCommunity Event Item Receipt` r
+        LEFT JOIN `tabCommunity Event Participant` p ON p.name = r.participant
+        WHERE r.event = %(event)s
+        AND r.item IN %(items)s
+        GROUP BY r.item
+        """,
+        {
+            "event": event,
+            "participant": participant,
+            "ptype": ptype,
+            "items": tuple(items),
+        },
+        as_dict=1,
+    )
+    for row in rows:
+        totals[row.item] = frappe._dict(
+            user_total=cint(row.user_total), event_total=cint(row.event_total)
+        )
+    return totals
+
+
+def remaining_quota(limit, total: int):
+    """None when the limit is unbounded (negative)"""
+    if cint(limit) < 0:
+        return None
+    return max(cint(limit) - total, 0)
+
+
+@frappe.whitelist(allow_guest=False)
+@read_only(read_your_writes=True, retry_on_primary=frappe.DoesNotExistError)
+def get_participant_items(event: str, virtual_id: str):
+    """verify a participant and list the items they can still receive
+
+    runs a fixed number of queries regardless of how many items the event has.
+    a virtual id or registration the replica doesn't have yet is looked up
+    again on the primary"""
+    if not current_user_is_event_admin(event):
+        frappe.throw(f"User is not an admin for event {event=!r}")
+
+    row = frappe.db.sql(
+        """
+        SELECT
+            v.owner AS user, u.full_name, p.name AS participant, p.participant_type
+        FROM `tabVirtual ID` AS v
+        LEFT JOIN `tabUser` AS u
+            ON u.name = v.owner
+        LEFT JOIN `tabCommunity Event Participant` AS p
+            ON p.community_user = v.owner AND p.community_event = %(event)s
+        WHERE v.name = %(virtual_id)s
+        """,
+        {"event": event, "virtual_id": virtual_id},
+        as_dict=1,
+    )
+    if not row:
+        frappe.throw("Invalid Virtual ID", frappe.DoesNotExistError)
+    row = row[0]
+    if not row.participant:
+        frappe.throw("User is not registered for event", frappe.DoesNotExistError)
+
+    ptype = row.participant_type or ""
+    # one entry per item, the first matching row is the one distribute_item enforces
+    eligible = {}
+    for s in frappe.get_cached_doc("Community Event", event).get("items"):
+        if ptype == (s.participant_type or ""):
+            eligible.setdefault(s.item, s)
+    totals = get_item_totals(event, row.participant, ptype, list(eligible))
+
+    items = []
+    for s in eligible.values():
+        q = totals[s.item]
+        user_remaining = remaining_quota(s.user_max, q.user_total)
+        event_remaining = remaining_quota(s.event_max, q.event_total)
+        items.append(
+            {
+                "item": s.item,
+                "user_max": s.user_max,
+                "event_max": s.event_max,
+                "user_remaining": user_remaining,
+                "event_remaining": event_remaining,
+                "available": user_remaining != 0 and event_remaining != 0,
+            }
+        )
+
+    return {
+        "ok": True,
+        "data": row.full_name,
+        "participant": row.participant,
+        "participant_type": row.participant_type,
+        "items": items,
+    }
+
+
 @frappe.whitelist(allow_guest=False)
 def distribute_item(event: str, item: str, virtual_id: str):
     """indicate that item has been received"""
@@ -335,18 +587,7 @@ def distribute_item(event: str, item: str, virtual_id: str):
         )
 
     def validate(after=False):
-        q = frappe.db.sql(
-            f"""SELECT
-            COALESCE(SUM(CASE WHEN r.participant = %(participant)s THEN 1 ELSE 0 END), 0) AS user_total,
-            COALESCE(SUM(CASE WHEN COALESCE(p.participant_type, "") = %(ptype)s THEN 1 ELSE 0 END), 0) AS event_total
-            FROM `tab{dt}` r
-            LEFT JOIN `tabCommunity Event Participant` p ON p.name = r.participant
-            WHERE r.event = %(event)s
-            AND r.item = %(item)s
-            """,
-            {"event": event, "participant": participant, "ptype": ptype, "item": item},
-            as_dict=1,
-        )[0]
+        q = get_item_totals(event, participant, ptype, [item])[item]
         op = operator.gt if after else operator.ge
         if cint(row.user_max) >= 0 and op(q.user_total, row.user_max):
             frappe.throw(f"User total ({row.user_max}) exceeded for item {item}")
@@ -370,7 +611,50 @@ def distribute_item(event: str, item: str, virtual_id: str):
     return receipt
 
 
+@frappe.whitelist(allow_guest=False)
+def replica_routing_stats():
+    """how many read only endpoint calls were served by the replica vs the primary
+
+    counts calls to the decorated endpoints, not the queries they run"""
+    frappe.only_for("System Manager")
+    return replica.get_stats()
+
+
+@frappe.whitelist(allow_guest=False)
+def broadcast_leaderboard(event: str, rate: Optional[float] = None):
+    """queue a whatsapp message with their current standing to every participant"""
+    if not current_user_is_event_admin(event):
+        frappe.throw(f"User is not an admin for event {event=!r}")
+
+    from community_waba_events.community_waba_events.doctype.community_event_leaderboard_broadcast.community_event_leaderboard_broadcast import (
+        get_sender,
+    )
+
+    # fail now rather than in the background job when no sender is configured
+    get_sender()
+    doc = frappe.get_doc(
+        {"doctype": "Community Event Leaderboard Broadcast", "event": event}
+    )
+    if rate:
+        doc.rate = rate
+    doc.insert(ignore_permissions=True)
+    doc.enqueue()
+    return doc
+
+
+@frappe.whitelist(allow_guest=False)
+def resume_leaderboard_broadcast(broadcast: str):
+    """continue an interrupted broadcast after the last participant it reached"""
+    doc = frappe.get_doc("Community Event Leaderboard Broadcast", broadcast)
+    if not current_user_is_event_admin(doc.event):
+        frappe.throw(f"User is not an admin for event {doc.event!r}")
+
+    doc.resume()
+    return doc
+
+
 @frappe.whitelist()
+@read_only()
 @frappe.validate_and_sanitize_search_inputs
 def get_event_items(doctype, txt, searchfield, start, page_len, filters):
 
@@ -4,5 +4,25 @@
 # import frappe
 from frappe.model.document import Document
 
+from community_waba_events.community_waba_events.doctype.community_event_activity_score_rollup.community_event_activity_score_rollup import (
+	add_to_rollups,
+)
+
 class CommunityEventActivityScore(Document):
-	pass
+	def after_insert(self):
+		add_to_rollups(self.event, self.participant, self.score, self.creation)
+
+	def on_update(self):
+		# inserts are handled in after_insert
+		before = self.get_doc_before_save()
+		if not before or (before.event, before.participant, before.score) == (
+			self.event,
+			self.participant,
+			self.score,
+		):
+			return
+		add_to_rollups(before.event, before.participant, -before.score, before.creation, entries=-1)
+		add_to_rollups(self.event, self.participant, self.score, self.creation)
+
+	def on_trash(self):
+		add_to_rollups(self.event, self.participant, -self.score, self.creation, entries=-1)
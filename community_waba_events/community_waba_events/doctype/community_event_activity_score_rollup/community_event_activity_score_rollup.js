@@ -0,0 +1,8 @@
+// Copyright (c) 2025, Manqala Ltd and contributors
+// For license information, please see license.txt
+
+frappe.ui.form.on('Community Event Activity Score Rollup', {
+	// refresh: function(frm) {
+
+	// }
+});
@@ -0,0 +1,128 @@
+# Copyright (c) 2025, Manqala Ltd and contributors
+# For license information, please see license.txt
+
+import hashlib
+
+import frappe
+from frappe.model.document import Document
+from frappe.utils import get_datetime, now
+
+DOCTYPE = "Community Event Activity Score Rollup"
+
+# python strftime and mariadb DATE_FORMAT patterns that truncate to the bucket start
+GRANULARITIES = {
+	"Minute": ("%Y-%m-%d %H:%M:00", "%%Y-%%m-%%d %%H:%%i:00"),
+	"Hour": ("%Y-%m-%d %H:00:00", "%%Y-%%m-%%d %%H:00:00"),
+	"Day": ("%Y-%m-%d 00:00:00", "%%Y-%%m-%%d 00:00:00"),
+}
+
+
+class CommunityEventActivityScoreRollup(Document):
+	pass
+
+
+def on_doctype_update():
+	frappe.db.add_index(DOCTYPE, ["event", "granularity", "participant", "bucket"])
+
+
+def rollup_name(event, participant, granularity, bucket):
+	"""deterministic name so a bucket can be upserted on the primary key
+
+	must match the MD5(CONCAT_WS(...)) used in rebuild_rollups"""
+	key = ":".join((event, participant or "", granularity, bucket))
+	return hashlib.md5(key.encode()).hexdigest()
+
+
+def add_to_rollups(event, participant, score, creation, entries=1):
+	"""add a score to the participant and event wide buckets it falls in
+
+	every score in an event shares the event wide rows, so they are updated in
+	their own short transaction after the request commits instead of being
+	locked until then"""
+	upsert_rollups(event, participant, score, creation, entries)
+	frappe.db.after_commit.add(
+		lambda: update_event_rollups(event, score, creation, entries)
+	)
+
+
+def update_event_rollups(event, score, creation, entries):
+	upsert_rollups(event, None, score, creation, entries)
+	frappe.db.commit()
+
+
+def upsert_rollups(event, participant, score, creation, entries):
+	"""add to the minute, hour and day buckets of one series"""
+	creation = get_datetime(creation)
+	timestamp = now()
+	user = frappe.session.user
+	rows = []
+	for granularity, (fmt, _) in GRANULARITIES.items():
+		bucket = creation.strftime(fmt)
+		rows.append(
+			(
+				rollup_name(event, participant, granularity, bucket),
+				timestamp,
+				timestamp,
+				user,
+				user,
+				event,
+				participant,
+				granularity,
+				bucket,
+				score,
+				entries,
+			)
+		)
+
+	placeholders = ", ".join(["(%s, %s, %s, %s, %s, 0, 0, %s, %s, %s, %s, %s, %s)"] * len(rows))
+	frappe.db.sql(
+		f"""INSERT INTO `tab{DOCTYPE}`
+		(name, creation, modified, modified_by, owner, docstatus, idx,
+		event, participant, granularity, bucket, score, entries)
+		VALUES {placeholders}
+		ON DUPLICATE KEY UPDATE
+		score = score + VALUES(score),
+		entries = entries + VALUES(entries),
+		modified = VALUES(modified)
+		""",
+		tuple(v for row in rows for v in row),
+	)
+
+
+def rebuild_rollups(event=None):
+	"""recompute rollups from the raw scores, for all events or a single one"""
+	condition = "WHERE s.event = %(event)s" if event else ""
+	frappe.db.sql(
+		f"DELETE FROM `tab{DOCTYPE}` {'WHERE event = %(event)s' if event else ''}",
+		{"event": event},
+	)
+	for granularity, (_, sql_fmt) in GRANULARITIES.items():
+		# participant level rows, then event wide rows with no participant
+		for participant, group_by in (("s.participant", "s.event, s.participant"), ("NULL", "s.event")):
+			frappe.db.sql(
+				f"""INSERT INTO `tab{DOCTYPE}`
+				(name, creation, modified, modified_by, owner, docstatus, idx,
+				event, participant, granularity, bucket, score, entries)
+				SELECT
+					MD5(CONCAT_WS(':', t.event, COALESCE(t.participant, ''), %(granularity)s, t.bucket)),
+					%(now)s, %(now)s, %(user)s, %(user)s, 0, 0,
+					t.event, t.participant, %(granularity)s, t.bucket, t.score, t.entries
+				FROM (
+					SELECT
+						s.event,
+						{participant} AS participant,
+						DATE_FORMAT(s.creation, '{sql_fmt}') AS bucket,
+						SUM(s.score) AS score,
+						COUNT(*) AS entries
+					FROM `tabCommunity Event Activity Score` AS s
+					{condition}
+					GROUP BY {group_by}, DATE_FORMAT(s.creation, '{sql_fmt}')
+				) AS t
+				""",
+				{
+					"event": event,
+					"granularity": granularity,
+					"now": now(),
+					"user": frappe.session.user,
+				},
+			)
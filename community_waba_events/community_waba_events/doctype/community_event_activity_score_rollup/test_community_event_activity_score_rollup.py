@@ -0,0 +1,143 @@
+# Copyright (c) 2025, Manqala Ltd and Contributors
+# See license.txt
+
+import unittest
+
+import frappe
+from frappe.utils import get_datetime
+
+from community_waba_events.api import activity_trend
+from community_waba_events.community_waba_events.doctype.community_event_activity_score_rollup.community_event_activity_score_rollup import (
+	DOCTYPE,
+	add_to_rollups,
+	rebuild_rollups,
+	rollup_name,
+)
+from community_waba_events.tests.utils import (
+	delete_event_data,
+	make_event,
+	make_participant,
+	make_score,
+	make_user,
+)
+
+EVENT = "_Test Rollup Event"
+USER_A = "_test_rollup_a@example.com"
+USER_B = "_test_rollup_b@example.com"
+
+
+def rollup_rows():
+	return frappe.db.sql(
+		f"""SELECT name, participant, granularity, bucket, score, entries
+		FROM `tab{DOCTYPE}`
+		WHERE event = %s
+		ORDER BY name""",
+		(EVENT,),
+	)
+
+
+class TestCommunityEventActivityScoreRollup(unittest.TestCase):
+	def setUp(self):
+		frappe.set_user("Administrator")
+		delete_event_data(EVENT)
+		make_event(EVENT)
+		for user in (USER_A, USER_B):
+			make_user(user)
+			make_participant(EVENT, user)
+		self.scores = [
+			make_score(EVENT, USER_A, 2, "2025-01-01 10:00:10"),
+			make_score(EVENT, USER_A, 1, "2025-01-01 10:00:50"),
+			make_score(EVENT, USER_A, 1, "2025-01-01 10:05:00"),
+			make_score(EVENT, USER_B, 1, "2025-01-01 10:30:00"),
+			make_score(EVENT, USER_B, 1, "2025-01-01 11:15:00"),
+			make_score(EVENT, USER_B, 1, "2025-01-02 09:00:00"),
+		]
+		# flush the event wide rows added after commit for the insert time,
+		# then bucket the scores by their backdated creation
+		frappe.db.commit()
+		rebuild_rollups(EVENT)
+		frappe.db.commit()
+
+	def tearDown(self):
+		frappe.set_user("Administrator")
+		delete_event_data(EVENT)
+
+	def test_rollup_name_matches_sql(self):
+		for participant in (USER_A, None):
+			sql_name = frappe.db.sql(
+				"SELECT MD5(CONCAT_WS(':', %s, COALESCE(%s, ''), %s, %s))",
+				(EVENT, participant, "Hour", "2025-01-01 10:00:00"),
+			)[0][0]
+			self.assertEqual(sql_name, rollup_name(EVENT, participant, "Hour", "2025-01-01 10:00:00"))
+
+	def test_add_to_rollups(self):
+		def rows(participant, bucket):
+			return frappe.db.sql(
+				f"""SELECT granularity, score, entries FROM `tab{DOCTYPE}`
+				WHERE event = %s AND participant <=> %s AND bucket = %s
+				ORDER BY granularity""",
+				(EVENT, participant, bucket),
+			)
+
+		add_to_rollups(EVENT, USER_A, 3, "2025-03-01 08:15:30")
+		add_to_rollups(EVENT, USER_A, 2, "2025-03-01 08:45:00")
+		# event wide rows wait for the commit
+		self.assertFalse(rows(None, "2025-03-01 08:00:00"))
+		frappe.db.commit()
+
+		for participant in (USER_A, None):
+			self.assertEqual(rows(participant, "2025-03-01 08:15:00"), (("Minute", 3, 1),))
+			self.assertEqual(rows(participant, "2025-03-01 08:00:00"), (("Hour", 5, 2),))
+			self.assertEqual(rows(participant, "2025-03-01 00:00:00"), (("Day", 5, 2),))
+
+		# removing a score is a negative delta
+		add_to_rollups(EVENT, USER_A, -2, "2025-03-01 08:45:00", entries=-1)
+		frappe.db.commit()
+		self.assertEqual(rows(USER_A, "2025-03-01 08:00:00"), (("Hour", 3, 1),))
+		self.assertEqual(rows(None, "2025-03-01 08:45:00"), (("Minute", 0, 0),))
+
+	def test_incremental_matches_rebuild(self):
+		rebuilt = rollup_rows()
+		self.assertTrue(rebuilt)
+
+		# replay the scores one at a time at their creation time
+		frappe.db.delete(DOCTYPE, {"event": EVENT})
+		for s in self.scores:
+			add_to_rollups(s.event, s.participant, s.score, s.creation)
+		frappe.db.commit()
+		self.assertEqual(rollup_rows(), rebuilt)
+
+		# edits and deletes are applied as deltas
+		score = self.scores[0]
+		score.score = 5
+		score.save(ignore_permissions=True)
+		score = self.scores[3]
+		score.participant = USER_A
+		score.save(ignore_permissions=True)
+		self.scores[4].delete(ignore_permissions=True)
+		frappe.db.commit()
+
+		incremental = [row for row in rollup_rows() if row[5]]
+		rebuild_rollups(EVENT)
+		self.assertEqual(incremental, rollup_rows())
+
+	def test_activity_trend(self):
+		trend = activity_trend(
+			event=EVENT, granularity="Hour", start="2025-01-01 00:00:00", end="2025-01-01 23:59:59"
+		)
+		self.assertEqual(
+			[(row.bucket, row.score, row.entries) for row in trend],
+			[(get_datetime("2025-01-01 10:00:00"), 5, 4), (get_datetime("2025-01-01 11:00:00"), 1, 1)],
+		)
+
+		trend = activity_trend(event=EVENT, participant=USER_B, granularity="Day")
+		self.assertEqual([(row.score, row.entries) for row in trend], [(2, 2), (1, 1)])
+
+		# participants only see their own series
+		frappe.set_user(USER_A)
+		trend = activity_trend(event=EVENT, granularity="Minute")
+		self.assertEqual([row.score for row in trend], [3, 1])
+		self.assertRaises(
+			frappe.ValidationError, activity_trend, event=EVENT, participant=USER_B, granularity="Hour"
+		)
+		self.assertRaises(frappe.ValidationError, activity_trend, event=EVENT, granularity="Week")
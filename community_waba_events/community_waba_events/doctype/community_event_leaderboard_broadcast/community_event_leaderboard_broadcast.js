@@ -0,0 +1,17 @@
+// Copyright (c) 2025, Manqala Ltd and contributors
+// For license information, please see license.txt
+
+frappe.ui.form.on('Community Event Leaderboard Broadcast', {
+	refresh: function(frm) {
+		// the server only resumes failed broadcasts, or ones whose worker died
+		if (!frm.is_new() && frm.doc.status !== 'Completed') {
+			frm.add_custom_button(__('Resume'), () => {
+				frappe.call({
+					method: 'community_waba_events.api.resume_leaderboard_broadcast',
+					args: { broadcast: frm.doc.name },
+					callback: () => frm.reload_doc(),
+				});
+			});
+		}
+	}
+});
@@ -0,0 +1,215 @@
+# Copyright (c) 2025, Manqala Ltd and contributors
+# For license information, please see license.txt
+
+import time
+
+import frappe
+from frappe.model.document import Document
+from frappe.utils import add_to_date, flt, now, now_datetime
+
+from community_waba_events.api import get_all_participant_scores
+
+DOCTYPE = "Community Event Leaderboard Broadcast"
+BATCH_SIZE = 50
+MAX_RETRIES = 3
+RETRY_BACKOFF = 0.5
+JOB_TIMEOUT = 3600
+LEADERBOARD_FIELDS = ("total_score", "position", "percentile", "highest_score", "participants")
+
+
+class NonRetryableSendError(Exception):
+	"""raised by a sender when retrying can't help, e.g. bad credentials
+
+	stops the broadcast with its progress saved so it can be resumed"""
+
+
+class CommunityEventLeaderboardBroadcast(Document):
+	def validate(self):
+		if flt(self.rate) <= 0:
+			frappe.throw("Rate must be greater than 0 messages per second")
+
+	def enqueue(self):
+		frappe.enqueue(
+			"community_waba_events.community_waba_events.doctype.community_event_leaderboard_broadcast.community_event_leaderboard_broadcast.run_broadcast",
+			queue="long",
+			timeout=JOB_TIMEOUT,
+			broadcast=self.name,
+			enqueue_after_commit=True,
+		)
+
+	def resume(self):
+		"""queue the broadcast again if it failed, or its worker died without finishing
+
+		a queued or running broadcast with no progress for longer than the job
+		timeout is treated as dead"""
+		frappe.db.sql(
+			f"""UPDATE `tab{DOCTYPE}`
+			SET status = 'Queued', modified = %(now)s
+			WHERE name = %(name)s
+			AND (status = 'Failed' OR (status IN ('Queued', 'Running') AND modified < %(stale)s))
+			""",
+			{
+				"name": self.name,
+				"now": now(),
+				"stale": add_to_date(now_datetime(), seconds=-JOB_TIMEOUT),
+			},
+		)
+		if not frappe.db._cursor.rowcount:
+			frappe.throw(f"Broadcast is {self.status.lower()} and can't be resumed")
+		self.enqueue()
+		self.reload()
+
+
+class TokenBucket:
+	"""allows `rate` acquisitions per second, with bursts of up to `capacity`"""
+
+	def __init__(self, rate, capacity=None, clock=time.monotonic, sleep=time.sleep):
+		if rate <= 0:
+			raise ValueError("rate must be positive")
+		self.rate = rate
+		self.capacity = capacity or max(rate, 1)
+		self.tokens = self.capacity
+		self.clock = clock
+		self.sleep = sleep
+		self.updated = clock()
+
+	def acquire(self, tokens=1):
+		current = self.clock()
+		self.tokens = min(self.capacity, self.tokens + (current - self.updated) * self.rate)
+		self.updated = current
+		# a negative balance is paid off by sleeping, and refilled on the next call
+		self.tokens -= tokens
+		if self.tokens < 0:
+			self.sleep(-self.tokens / self.rate)
+
+
+class MockSender:
+	"""local sender that records messages, for tests and dry runs
+
+	`failures` maps a recipient to how many sends fail before one succeeds,
+	recipients in `aborts` raise NonRetryableSendError on their first send"""
+
+	def __init__(self, failures=None, aborts=None):
+		self.sent = []
+		self.failures = dict(failures or {})
+		self.aborts = set(aborts or ())
+
+	def send(self, recipient, event, standing):
+		if recipient in self.aborts:
+			self.aborts.discard(recipient)
+			raise NonRetryableSendError(f"mock abort for {recipient}")
+		if self.failures.get(recipient, 0) > 0:
+			self.failures[recipient] -= 1
+			raise ConnectionError(f"mock failure for {recipient}")
+		self.sent.append((recipient, event, standing))
+
+
+def get_sender():
+	"""sender configured through the `leaderboard_broadcast_sender` hook
+
+	a sender has `send(recipient, event, standing)` and raises on failure"""
+	senders = frappe.get_hooks("leaderboard_broadcast_sender")
+	if not senders:
+		frappe.throw("No leaderboard_broadcast_sender hook configured")
+	return frappe.get_attr(senders[-1])()
+
+
+def send_with_retry(sender, bucket, recipient, event, standing, max_retries=MAX_RETRIES, sleep=time.sleep):
+	"""returns False once retries are used up, NonRetryableSendError is not retried"""
+	for attempt in range(max_retries + 1):
+		bucket.acquire()
+		try:
+			sender.send(recipient, event, standing)
+		except NonRetryableSendError:
+			raise
+		except Exception:
+			if attempt == max_retries:
+				frappe.log_error(
+					title=f"Leaderboard broadcast to {recipient} failed",
+					message=frappe.get_traceback(),
+				)
+				return False
+			sleep(RETRY_BACKOFF * 2**attempt)
+		else:
+			return True
+
+
+def get_pending(standings, last_participant):
+	"""standings after the participant a previous run stopped at"""
+	if not last_participant:
+		return standings
+	names = [s.participant for s in standings]
+	if last_participant in names:
+		return standings[names.index(last_participant) + 1 :]
+	return [s for s in standings if s.participant > last_participant]
+
+
+def as_standing(row):
+	"""same shape as the leaderboard api response"""
+	return {field: row[field] for field in LEADERBOARD_FIELDS}
+
+
+def claim(broadcast):
+	"""atomically mark the broadcast running, False if another worker has it or it is done"""
+	frappe.db.sql(
+		f"""UPDATE `tab{DOCTYPE}`
+		SET status = 'Running', modified = %s
+		WHERE name = %s AND status IN ('Queued', 'Failed')
+		""",
+		(now(), broadcast),
+	)
+	claimed = bool(frappe.db._cursor.rowcount)
+	frappe.db.commit()
+	return claimed
+
+
+def run_broadcast(broadcast, sender=None):
+	"""send each participant their standing, resuming after `last_participant`
+
+	progress is committed per batch, and up to the last message sent when the
+	run stops early, so a resumed run sends nobody the same standing twice"""
+	if not claim(broadcast):
+		return None
+	doc = frappe.get_doc(DOCTYPE, broadcast)
+
+	# sent and failed since the last save, run_sent for this run's rate
+	progress = frappe._dict(sent=0, failed=0, run_sent=0, last_participant=doc.last_participant)
+	start = time.monotonic()
+
+	def save_progress(**extra):
+		elapsed = time.monotonic() - start
+		doc.db_set(
+			{
+				"sent": doc.sent + progress.sent,
+				"failed": doc.failed + progress.failed,
+				"last_participant": progress.last_participant,
+				"messages_per_second": progress.run_sent / elapsed if elapsed else 0,
+				**extra,
+			}
+		)
+		progress.sent = progress.failed = 0
+		frappe.db.commit()
+
+	try:
+		sender = sender or get_sender()
+		bucket = TokenBucket(flt(doc.rate))
+		standings = get_all_participant_scores(doc.event)
+		doc.db_set({"total": len(standings), "started_at": doc.started_at or now(), "error": None})
+		frappe.db.commit()
+
+		for i, s in enumerate(get_pending(standings, doc.last_participant), 1):
+			if send_with_retry(sender, bucket, s.community_user, doc.event, as_standing(s)):
+				progress.sent += 1
+				progress.run_sent += 1
+			else:
+				progress.failed += 1
+			progress.last_participant = s.participant
+			if i % BATCH_SIZE == 0:
+				save_progress()
+	except Exception:
+		frappe.db.rollback()
+		save_progress(status="Failed", error=frappe.get_traceback())
+		raise
+
+	save_progress(status="Completed", finished_at=now())
+	return doc
@@ -0,0 +1,147 @@
+# Copyright (c) 2025, Manqala Ltd and Contributors
+# See license.txt
+
+import unittest
+from unittest.mock import patch
+
+import frappe
+from frappe.utils import add_to_date, now_datetime
+
+from community_waba_events.api import broadcast_leaderboard
+from community_waba_events.community_waba_events.doctype.community_event_leaderboard_broadcast.community_event_leaderboard_broadcast import (
+	DOCTYPE,
+	JOB_TIMEOUT,
+	LEADERBOARD_FIELDS,
+	MockSender,
+	NonRetryableSendError,
+	TokenBucket,
+	get_pending,
+	run_broadcast,
+	send_with_retry,
+)
+from community_waba_events.tests.utils import (
+	delete_event_data,
+	make_event,
+	make_participant,
+	make_score,
+)
+
+EVENT = "_Test Broadcast Event"
+USERS = [f"_test_broadcast_{i}@example.com" for i in range(5)]
+
+
+class FakeClock:
+	def __init__(self):
+		self.now = 0.0
+
+	def __call__(self):
+		return self.now
+
+	def sleep(self, seconds):
+		self.now += seconds
+
+
+class TestCommunityEventLeaderboardBroadcast(unittest.TestCase):
+	def test_token_bucket_limits_rate(self):
+		clock = FakeClock()
+		bucket = TokenBucket(10, capacity=1, clock=clock, sleep=clock.sleep)
+		for _ in range(11):
+			bucket.acquire()
+		self.assertAlmostEqual(clock.now, 1.0)
+
+	def test_send_with_retry(self):
+		clock = FakeClock()
+		sender = MockSender(failures={"a": 2, "b": 5}, aborts={"c"})
+		bucket = TokenBucket(1000, clock=clock, sleep=clock.sleep)
+
+		self.assertTrue(send_with_retry(sender, bucket, "a", "EV", {"position": 1}, sleep=clock.sleep))
+		self.assertEqual([m[0] for m in sender.sent], ["a"])
+		# backoff of 0.5s then 1s between the three attempts
+		self.assertAlmostEqual(clock.now, 1.5)
+
+		with patch("frappe.log_error") as log_error:
+			self.assertFalse(
+				send_with_retry(sender, bucket, "b", "EV", {"position": 2}, max_retries=2, sleep=clock.sleep)
+			)
+		log_error.assert_called_once()
+		self.assertEqual(sender.failures["b"], 2)
+
+		self.assertRaises(
+			NonRetryableSendError, send_with_retry, sender, bucket, "c", "EV", {}, sleep=clock.sleep
+		)
+		self.assertEqual([m[0] for m in sender.sent], ["a"])
+
+	def test_get_pending_resumes_after_last_participant(self):
+		standings = [frappe._dict(participant=p) for p in ("a", "b", "c")]
+		self.assertEqual(get_pending(standings, None), standings)
+		self.assertEqual([s.participant for s in get_pending(standings, "b")], ["c"])
+
+
+class TestRunBroadcast(unittest.TestCase):
+	def setUp(self):
+		delete_event_data(EVENT)
+		make_event(EVENT)
+		for i, user in enumerate(USERS):
+			make_participant(EVENT, user)
+			# the last participant has no score and still gets a standing
+			if i < len(USERS) - 1:
+				make_score(EVENT, user, i + 1, "2025-01-01 10:00:00")
+		self.broadcast = frappe.get_doc({"doctype": DOCTYPE, "event": EVENT, "rate": 1000}).insert(
+			ignore_permissions=True
+		)
+		frappe.db.commit()
+
+	def tearDown(self):
+		delete_event_data(EVENT)
+
+	def test_interrupted_run_resumes_without_duplicates(self):
+		sender = MockSender(aborts={USERS[2]})
+		self.assertRaises(NonRetryableSendError, run_broadcast, self.broadcast.name, sender=sender)
+
+		doc = frappe.get_doc(DOCTYPE, self.broadcast.name)
+		self.assertEqual(doc.status, "Failed")
+		self.assertEqual((doc.total, doc.sent, doc.failed), (5, 2, 0))
+		self.assertEqual(doc.last_participant, USERS[1])
+
+		run_broadcast(self.broadcast.name, sender=sender)
+
+		doc.reload()
+		self.assertEqual(doc.status, "Completed")
+		self.assertEqual((doc.total, doc.sent, doc.failed), (5, 5, 0))
+		self.assertGreater(doc.messages_per_second, 0)
+		self.assertEqual(sorted(m[0] for m in sender.sent), sorted(USERS))
+		standings = {m[0]: m[2] for m in sender.sent}
+		self.assertEqual(tuple(standings[USERS[0]]), LEADERBOARD_FIELDS)
+		self.assertEqual(standings[USERS[3]]["position"], 1)
+		self.assertEqual(standings[USERS[4]]["total_score"], 0)
+
+	def test_running_broadcast_is_not_claimed_twice(self):
+		self.broadcast.db_set("status", "Running")
+		frappe.db.commit()
+		sender = MockSender()
+		self.assertIsNone(run_broadcast(self.broadcast.name, sender=sender))
+		self.assertEqual(sender.sent, [])
+
+		# resume refuses a live run, and takes over once it is stale
+		self.assertRaises(frappe.ValidationError, self.broadcast.resume)
+		frappe.db.set_value(
+			DOCTYPE,
+			self.broadcast.name,
+			"modified",
+			add_to_date(now_datetime(), seconds=-JOB_TIMEOUT - 60),
+			update_modified=False,
+		)
+		with patch("frappe.enqueue") as enqueue:
+			self.broadcast.resume()
+		enqueue.assert_called_once()
+		self.assertEqual(self.broadcast.status, "Queued")
+
+	def test_rate_must_be_positive(self):
+		for rate in (0, -5):
+			doc = frappe.get_doc({"doctype": DOCTYPE, "event": EVENT, "rate": rate})
+			self.assertRaises(frappe.ValidationError, doc.insert, ignore_permissions=True)
+
+	def test_broadcast_needs_a_sender(self):
+		with patch("frappe.get_hooks", return_value=[]):
+			self.assertRaises(frappe.ValidationError, broadcast_leaderboard, EVENT)
+		self.assertEqual(frappe.db.count(DOCTYPE, {"event": EVENT}), 1)
@@ -4,5 +4,11 @@
 # import frappe
 from frappe.model.document import Document
 
+from community_waba_events.community_waba_events.doctype.community_event_activity_score_rollup.community_event_activity_score_rollup import (
+	rebuild_rollups,
+)
+
 class CommunityEventParticipant(Document):
-	pass
+	def after_rename(self, old, new, merge=False):
+		# rollup names are hashed from the participant
+		rebuild_rollups(self.community_event)
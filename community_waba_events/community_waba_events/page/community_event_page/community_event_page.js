@@ -22,11 +22,8 @@ class CommunityEventAdmin {
     }
 
     setup() {
-        // load html5-qrcode script dynamically if not present (use CDN)
-        // if (typeof Html5Qrcode === 'undefined') {
-        //     $('<script src="https://unpkg.com/html5-qrcode@2.3.7/minified/html5-qrcode.min.js"></script>')
-        //         .appendTo('head');
-        // }
+        // html5-qrcode is loaded lazily in open_scanner, and cached by the service worker
+        community_waba_events.scanner.register_service_worker();
 
         // containers
         this.body.empty();
@@ -111,26 +108,7 @@ class CommunityEventAdmin {
         this.$event_area.append($verify);
 
         $verify.find('#verify-scan').on('click', () => {
-            this.open_scanner(async (decoded) => {
-                // on success: call server verify
-                const $res = $verify.find('#verify-result');
-                $res.html('<span class="text-muted">Checking...</span>');
-                try {
-                    frappe.dom.freeze("Verifying");
-                    const r = await frappe.call({
-                        method: 'community_waba_events.api.verify_participant',
-                        args: { event, virtual_id: decoded }
-                    });
-                    if (r && r.message && r.message.ok) {
-                        $res.html(`<div class="text-success">${r.message.data}</div>`);
-                    } else {
-                        const msg = (r && r.message && r.message.message) ? r.message.message : 'Not found';
-                        $res.html(`<div class="text-danger">${msg}</div>`);
-                    }
-                } finally {
-                    frappe.dom.unfreeze();
-                }
-            });
+            this.open_scanner((decoded) => this.verify_participant($verify.find('#verify-result'), event, decoded));
         });
 
         // Provide a Service section
@@ -223,6 +201,64 @@ class CommunityEventAdmin {
         });
     }
 
+    // verify participant and list the items they can receive in one request
+    async verify_participant($res, event, virtual_id) {
+        $res.html('<span class="text-muted">Checking...</span>');
+        let r;
+        try {
+            frappe.dom.freeze("Verifying");
+            r = await frappe.call({
+                method: 'community_waba_events.api.get_participant_items',
+                args: { event, virtual_id }
+            });
+        } finally {
+            frappe.dom.unfreeze();
+        }
+        if (!(r && r.message && r.message.ok)) {
+            const msg = (r && r.message && r.message.message) ? r.message.message : 'Not found';
+            $res.html(`<div class="text-danger">${msg}</div>`);
+            return;
+        }
+
+        const { data, participant_type, items } = r.message;
+        const quota = (remaining) => remaining === null ? 'unlimited' : remaining;
+        $res.html(`
+            <div class="text-success">${frappe.utils.escape_html(data || '')}</div>
+            <div class="small text-muted mb-2">${frappe.utils.escape_html(participant_type || '')}</div>
+        `);
+        if (!items.length) {
+            $res.append('<div class="text-muted">No items for this participant</div>');
+        }
+        items.forEach((row) => {
+            const $row = $(`
+                <div class="d-flex justify-content-between align-items-center mb-2">
+                  <div>
+                    <div>${frappe.utils.escape_html(row.item)}</div>
+                    <div class="small text-muted">
+                      user: ${quota(row.user_remaining)} left, event: ${quota(row.event_remaining)} left
+                    </div>
+                  </div>
+                  <button class="btn btn-sm btn-primary">Give</button>
+                </div>
+            `).appendTo($res);
+            $row.find('button').prop('disabled', !row.available).on('click', async () => {
+                try {
+                    frappe.dom.freeze("Submitting");
+                    const d = await frappe.call({
+                        method: 'community_waba_events.api.distribute_item',
+                        args: { event, item: row.item, virtual_id }
+                    });
+                    if (d && d.message) {
+                        frappe.show_alert({message: 'Service recorded', indicator: 'green'});
+                    }
+                } finally {
+                    frappe.dom.unfreeze();
+                }
+                this.verify_participant($res, event, virtual_id);
+            });
+        });
+    }
+
     open_scanner(on_success) {
         // Create modal overlay
         const $overlay = $(`
@@ -236,48 +272,26 @@ class CommunityEventAdmin {
             </div>
         `).appendTo('body');
 
-        const stopAndClose = (html5QrCode) => {
-            if (html5QrCode) {
-                console.log(">>> ", { html5QrCode })
-                html5QrCode.stop().catch(() => {}).then(()=> {
-                    html5QrCode.clear().catch(()=>{});
-                });
-            }
-            $overlay.remove();
-        };
+        const controller = new community_waba_events.scanner.ScannerController("qr-reader", {
+            // reject anything that isn't a virtual id before it reaches the server
+            parse: community_waba_events.scanner.parse_virtual_id,
+            on_invalid: () => frappe.show_alert({ message: 'Invalid QR code', indicator: 'red' }),
+            on_scan: (virtual_id) => {
+                stopAndClose();
+                return on_success(virtual_id);
+            },
+        });
 
-        // Wait for html5-qrcode to be available
-        const waitForLib = (cb) => {
-            if (typeof Html5Qrcode !== 'undefined') cb();
-            else setTimeout(()=>waitForLib(cb), 200);
+        const stopAndClose = () => {
+            controller.stop();
+            $overlay.remove();
         };
 
-        waitForLib(() => {
-            const html5QrCode = new Html5Qrcode("qr-reader");
-            const config = { fps: 10, qrbox: { width: 250, height: 250 } };
-            html5QrCode.start(
-                { facingMode: { exact: "environment" } }, // prefer back camera
-                config,
-                (decodedText, decodedResult) => {
-                    // decodedText is the content of the QR (we expect virtual id)
-                    on_success(decodedText);
-                    stopAndClose(html5QrCode);
-                },
-                (errorMessage) => {
-                    // ignore keep scanning
-                }
-            ).catch(err => {
-                // fallback to more permissive camera constraint
-                html5QrCode.start({ facingMode: "environment" }, config,
-                    (decodedText) => { on_success(decodedText); stopAndClose(html5QrCode); },
-                    () => {}
-                ).catch(e => {
-                    frappe.msgprint(`Unable to access camera: ${e.message}`);
-                    $overlay.remove();
-                });
-            });
+        $overlay.find('#close-qr').on('click', stopAndClose);
 
-            $overlay.find('#close-qr').on('click', () => stopAndClose(html5QrCode));
+        controller.start().catch(e => {
+            frappe.msgprint(`Unable to access camera: ${e.message || e}`);
+            stopAndClose();
         });
     }
 }
@@ -29,7 +29,7 @@ app_license = "MIT"
 
 # include js in page
 # page_js = {"page" : "public/js/file.js"}
-page_js = {"community-event-page": "public/js/html5-qrcode.min.js"}
+page_js = {"community-event-page": "public/js/qr_scanner.js"}
 app_include_css = "/assets/community_waba_events/css/community-event-page.css"
 
 # include js in doctype views
@@ -105,6 +105,19 @@ app_include_css = "/assets/community_waba_events/css/community-event-page.css"
 # 	}
 # }
 
+# writes that read_only(read_your_writes=True) endpoints must see
+doc_events = {
+    doctype: {
+        "on_update": "community_waba_events.replica.mark_write",
+        "on_trash": "community_waba_events.replica.mark_write",
+    }
+    for doctype in (
+        "Community Event Activity Score",
+        "Community Event Item Receipt",
+        "Community Event Participant",
+    )
+}
+
 # Scheduled Tasks
 # ---------------
 
@@ -187,3 +200,10 @@ user_data_fields = [
 # auth_hooks = [
 # 	"community_waba_events.auth.validate"
 # ]
+
+# Leaderboard Broadcast
+# ---------------------
+# Class with `send(recipient, event, standing)` used to deliver leaderboard
+# broadcasts, an app handling the whatsapp integration should provide one
+
+# leaderboard_broadcast_sender = "community_waba_events.community_waba_events.doctype.community_event_leaderboard_broadcast.community_event_leaderboard_broadcast.MockSender"
@@ -0,0 +1,12 @@
+import frappe
+
+from community_waba_events.community_waba_events.doctype.community_event_activity_score_rollup.community_event_activity_score_rollup import (
+    rebuild_rollups,
+)
+
+
+def execute():
+    frappe.reload_doc(
+        "community_waba_events", "doctype", "community_event_activity_score_rollup"
+    )
+    rebuild_rollups()
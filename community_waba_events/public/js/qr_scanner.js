@@ -0,0 +1,200 @@
+// shared qr scanner helpers for the scan_contact web page and the community-event-page desk page
+window.community_waba_events = window.community_waba_events || {};
+
+community_waba_events.scanner = (function() {
+    const LIB_URL = "/assets/community_waba_events/js/html5-qrcode.min.js";
+    const SW_URL = "/api/method/community_waba_events.api.scanner_service_worker";
+    const VIEW_CONTACT_PATH = "/api/method/community_waba_events.api.view_contact";
+    const VIRTUAL_ID_PATTERN = /^[\w.:-]{1,140}$/;
+
+    let lib_promise = null;
+    const measure_listeners = [];
+
+    // load html5-qrcode once, only when a camera is actually opened
+    const load_library = () => {
+        if (typeof Html5Qrcode !== 'undefined') return Promise.resolve();
+        if (!lib_promise) {
+            lib_promise = new Promise((resolve, reject) => {
+                const script = document.createElement('script');
+                script.src = LIB_URL;
+                script.async = true;
+                script.onload = () => resolve();
+                script.onerror = () => {
+                    lib_promise = null;
+                    script.remove();
+                    reject(new Error("Unable to load QR scanner"));
+                };
+                document.head.appendChild(script);
+            });
+        }
+        return lib_promise;
+    };
+
+    // precache the scanner assets so repeat visits start the camera without a download
+    const register_service_worker = () => {
+        if (!('serviceWorker' in navigator) || !window.isSecureContext) return;
+        navigator.serviceWorker.register(SW_URL, { scope: '/' }).catch((e) => {
+            console.log("scanner service worker registration failed: ", e);
+        });
+    };
+
+    const mark = (name) => {
+        if (window.performance && performance.mark) performance.mark(`scanner:${name}`);
+    };
+
+    // record the time between two marks, see performance.getEntriesByName
+    // listeners added with on_measure receive (name, duration_ms)
+    const measure = (name, start, end) => {
+        if (!(window.performance && performance.measure)) return;
+        let entry;
+        try {
+            entry = performance.measure(`scanner:${name}`, `scanner:${start}`, `scanner:${end}`);
+        } catch (e) {
+            // start mark missing
+            return;
+        }
+        // older browsers return undefined from performance.measure
+        entry = entry || performance.getEntriesByName(`scanner:${name}`).pop();
+        if (!entry) return;
+        measure_listeners.forEach((cb) => {
+            try {
+                cb(name, entry.duration);
+            } catch (e) {
+                console.log("scanner measure listener failed: ", e);
+            }
+        });
+        return entry.duration;
+    };
+
+    const on_measure = (cb) => measure_listeners.push(cb);
+
+    // returns the share url if text is a view_contact link on this site, else null.
+    // other hosts are rejected so the scanner's own virtual id is never sent off site
+    const parse_share_url = (text) => {
+        let url;
+        try {
+            url = new URL(text);
+        } catch (e) {
+            return null;
+        }
+        if (url.origin !== window.location.origin) return null;
+        if (url.pathname !== VIEW_CONTACT_PATH) return null;
+        if (!VIRTUAL_ID_PATTERN.test(url.searchParams.get("virtual_id") || "")) return null;
+        return url;
+    };
+
+    // returns the virtual id from a bare id or a view_contact link, else null
+    const parse_virtual_id = (text) => {
+        text = (text || "").trim();
+        if (VIRTUAL_ID_PATTERN.test(text)) return text;
+        const url = parse_share_url(text);
+        return url ? url.searchParams.get("virtual_id") : null;
+    };
+
+    // slower devices get fewer decode attempts per second
+    const device_fps = () => {
+        const cores = navigator.hardwareConcurrency || 2;
+        const memory = navigator.deviceMemory || 2;
+        if (cores <= 2 || memory <= 1) return 5;
+        if (cores >= 6 && memory >= 4) return 15;
+        return 10;
+    };
+
+    // scan region sized to the viewfinder instead of a fixed 250px box
+    const qrbox = (width, height) => {
+        const size = Math.floor(Math.min(width, height) * 0.7);
+        return { width: Math.max(50, Math.min(size, 320)), height: Math.max(50, Math.min(size, 320)) };
+    };
+
+    class ScannerController {
+        // parse(text) returns the value to dispatch or null when the code is invalid
+        // on_scan(value, text) may return a promise; decodes are dropped while it is pending
+        constructor(element_id, { parse, on_scan, on_invalid, dedupe_window = 3000, fps } = {}) {
+            this.element_id = element_id;
+            this.parse = parse || ((text) => text);
+            this.on_scan = on_scan;
+            this.on_invalid = on_invalid;
+            this.dedupe_window = dedupe_window;
+            this.fps = fps || device_fps();
+            this.html5QrCode = null;
+            this.running = false;
+            this.stopped = false;
+            this.busy = false;
+            this.last_text = null;
+            this.last_time = 0;
+        }
+
+        start() {
+            this.stopped = false;
+            mark('open');
+            return load_library().then(() => {
+                if (this.stopped) return;
+                this.html5QrCode = this.html5QrCode || new Html5Qrcode(this.element_id);
+                const config = { fps: this.fps, qrbox };
+                const on_decode = (text) => this.handle_decode(text);
+                const ignore = () => {};
+                return this.html5QrCode.start({ facingMode: { exact: "environment" } }, config, on_decode, ignore)
+                    // fallback to more permissive camera constraint
+                    .catch(() => this.html5QrCode.start({ facingMode: "environment" }, config, on_decode, ignore))
+                    .then(() => {
+                        this.running = true;
+                        mark('ready');
+                        measure('camera-ready', 'open', 'ready');
+                        // closed while the camera was starting
+                        if (this.stopped) return this.stop();
+                    });
+            });
+        }
+
+        stop() {
+            this.stopped = true;
+            if (!this.running) return Promise.resolve();
+            this.running = false;
+            const html5QrCode = this.html5QrCode;
+            return html5QrCode.stop().catch(() => {}).then(() => {
+                try {
+                    html5QrCode.clear();
+                } catch (e) {
+                    // already cleared
+                }
+            });
+        }
+
+        handle_decode(text) {
+            if (this.stopped || this.busy) return;
+            const now = Date.now();
+            // shaky hands decode the same code many times in a row
+            if (text === this.last_text && now - this.last_time < this.dedupe_window) return;
+            this.last_text = text;
+            this.last_time = now;
+
+            const value = this.parse(text);
+            if (value === null || value === undefined) {
+                if (this.on_invalid) this.on_invalid(text);
+                return;
+            }
+
+            this.busy = true;
+            mark('decode');
+            Promise.resolve()
+                .then(() => this.on_scan && this.on_scan(value, text))
+                .catch((e) => console.log("scan dispatch failed: ", e))
+                .then(() => {
+                    mark('response');
+                    measure('decode-to-response', 'decode', 'response');
+                    this.busy = false;
+                });
+        }
+    }
+
+    return {
+        load_library,
+        register_service_worker,
+        mark,
+        measure,
+        on_measure,
+        parse_share_url,
+        parse_virtual_id,
+        ScannerController,
+    };
+})();
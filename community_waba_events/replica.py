@@ -0,0 +1,171 @@
+"""route read only endpoints to the replica database
+
+uses frappe's `read_from_replica` / `replica_host` site config. reads go to the
+primary while the replica is more than `replica_lag_threshold` seconds behind
+(or its lag is unknown), and users who wrote within that many seconds keep
+reading from the primary on endpoints that have to see their own writes.
+
+lag is read from the replica's `SHOW REPLICA STATUS`, which needs an extra grant
+for the site's database user on the replica:
+
+    GRANT REPLICA MONITOR ON *.* TO '<db_name>'@'%';      -- mariadb >= 10.5.9
+    GRANT REPLICATION CLIENT ON *.* TO '<db_name>'@'%';   -- older servers
+
+without it the lag is unknown and every read stays on the primary, an Error Log
+titled "Unable to read replica status" is written when that starts."""
+
+import functools
+import math
+import time
+
+import frappe
+import redis
+
+STATS_KEY = "community_waba_events:replica_routing"
+LAST_WRITE_KEY = "community_waba_events:last_write"
+LAG_KEY = "community_waba_events:replica_lag"
+LAG_ERROR_KEY = "community_waba_events:replica_lag_error"
+DEFAULT_LAG_THRESHOLD = 5
+LAG_CACHE_SECONDS = 5
+
+
+def lag_threshold() -> float:
+    return float(frappe.conf.get("replica_lag_threshold") or DEFAULT_LAG_THRESHOLD)
+
+
+def last_write_key(user: str = None) -> str:
+    return f"{LAST_WRITE_KEY}:{user or frappe.session.user}"
+
+
+def mark_write(doc=None, method=None):
+    """doc event hook, remembers when the current user last wrote
+
+    the key expires once the write is older than the lag threshold"""
+    frappe.cache().set_value(
+        last_write_key(), time.time(), expires_in_sec=math.ceil(lag_threshold())
+    )
+
+
+def recently_wrote(user: str = None) -> bool:
+    """True if the replica may not have caught up with the user's writes yet"""
+    last = frappe.cache().get_value(last_write_key(user))
+    return last is not None and time.time() - float(last) < lag_threshold()
+
+
+@frappe.read_only()
+def get_replica_status():
+    try:
+        return frappe.db.sql("SHOW REPLICA STATUS", as_dict=True)
+    except Exception as e:
+        if not frappe.db.is_syntax_error(e):
+            raise
+    # mariadb < 10.5
+    return frappe.db.sql("SHOW SLAVE STATUS", as_dict=True)
+
+
+def measure_replica_lag():
+    """seconds the replica is behind, None if replication is stopped or unreadable
+
+    a failure is logged once, and again only after a successful read"""
+    try:
+        status = get_replica_status()
+    except Exception:
+        if not frappe.cache().get_value(LAG_ERROR_KEY):
+            frappe.cache().set_value(LAG_ERROR_KEY, True)
+            frappe.log_error(
+                title="Unable to read replica status",
+                message=frappe.get_traceback()
+                + "\nreads stay on the primary, see community_waba_events/replica.py for the grant needed",
+            )
+        return None
+    frappe.cache().delete_value(LAG_ERROR_KEY)
+
+    if not status:
+        return None
+    # mysql 8 renamed the column
+    lag = status[0].get("Seconds_Behind_Master", status[0].get("Seconds_Behind_Source"))
+    return None if lag is None else float(lag)
+
+
+def replica_lag():
+    """replica lag in seconds, measured at most every LAG_CACHE_SECONDS"""
+    cached = frappe.cache().get_value(LAG_KEY)
+    if cached is None:
+        cached = {"lag": measure_replica_lag()}
+        frappe.cache().set_value(LAG_KEY, cached, expires_in_sec=LAG_CACHE_SECONDS)
+    return cached["lag"]
+
+
+def use_replica(read_your_writes: bool = False) -> bool:
+    if not frappe.conf.read_from_replica:
+        return False
+    if read_your_writes and recently_wrote():
+        return False
+    lag = replica_lag()
+    return lag is not None and lag <= lag_threshold()
+
+
+# stats are plain redis counters, so they go through redis.Redis directly and
+# skip RedisWrapper's pickling
+def record(endpoint: str, replica: bool):
+    field = f"{endpoint}:{'replica' if replica else 'primary'}"
+    redis.Redis.hincrby(frappe.cache(), frappe.cache().make_key(STATS_KEY), field, 1)
+
+
+def get_stats():
+    """calls per endpoint on each connection, and the share served by the replica
+
+    counts endpoint calls, not queries. a call retried on the primary after the
+    replica missed a record counts once on each"""
+    raw = redis.Redis.hgetall(frappe.cache(), frappe.cache().make_key(STATS_KEY)) or {}
+    stats = {}
+    for field, count in raw.items():
+        field = frappe.safe_decode(field)
+        endpoint, target = field.rsplit(":", 1)
+        stats.setdefault(endpoint, {"replica": 0, "primary": 0})[target] = int(count)
+
+    totals = {"replica": 0, "primary": 0}
+    for row in stats.values():
+        row["replica_share"] = row["replica"] / ((row["replica"] + row["primary"]) or 1)
+        totals["replica"] += row["replica"]
+        totals["primary"] += row["primary"]
+    totals["replica_share"] = totals["replica"] / (
+        (totals["replica"] + totals["primary"]) or 1
+    )
+    return {"endpoints": stats, "total": totals}
+
+
+def reset_stats():
+    redis.Redis.delete(frappe.cache(), frappe.cache().make_key(STATS_KEY))
+
+
+def read_only(read_your_writes: bool = False, retry_on_primary=()):
+    """run the function on the replica when one is configured and caught up
+
+    with read_your_writes, users with a write newer than the lag threshold
+    stay on the primary. exceptions listed in retry_on_primary, e.g.
+    frappe.DoesNotExistError for a record that hasn't replicated yet, rerun the
+    function on the primary. `fn.on_primary` always runs it on the primary"""
+
+    def decorator(fn):
+        replica_fn = frappe.read_only()(fn)
+
+        def on_primary(*args, **kwargs):
+            record(fn.__name__, False)
+            return fn(*args, **frappe.get_newargs(fn, kwargs))
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not use_replica(read_your_writes):
+                return on_primary(*args, **kwargs)
+            record(fn.__name__, True)
+            try:
+                return replica_fn(*args, **kwargs)
+            except retry_on_primary:
+                frappe.clear_last_message()
+                return on_primary(*args, **kwargs)
+
+        wrapper.on_primary = on_primary
+        return wrapper
+
+    return decorator
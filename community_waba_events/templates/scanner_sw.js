@@ -0,0 +1,61 @@
+// service worker for the qr scanner pages
+// rendered and served by community_waba_events.api.scanner_service_worker
+
+const CACHE_PREFIX = "community-waba-events-scanner-";
+const CACHE_NAME = CACHE_PREFIX + "{{ version }}";
+const ASSETS = {{ assets | tojson }};
+
+const cache_if_ok = (cache, key, response) => {
+    if (response && response.ok && !response.redirected && response.type === "basic") {
+        cache.put(key, response.clone());
+    }
+    return response;
+};
+
+self.addEventListener("install", (event) => {
+    event.waitUntil(
+        caches.open(CACHE_NAME).then((cache) =>
+            Promise.all(
+                ASSETS.map((path) =>
+                    fetch(path, { credentials: "same-origin", cache: "reload" })
+                        .then((r) => cache_if_ok(cache, path, r))
+                        .catch(() => {})
+                )
+            )
+        ).then(() => self.skipWaiting())
+    );
+});
+
+self.addEventListener("activate", (event) => {
+    // drop caches from previous app or asset builds
+    event.waitUntil(
+        caches.keys().then((keys) =>
+            Promise.all(
+                keys
+                    .filter((key) => key.startsWith(CACHE_PREFIX) && key !== CACHE_NAME)
+                    .map((key) => caches.delete(key))
+            )
+        ).then(() => self.clients.claim())
+    );
+});
+
+// assets: cache first, keyed on the path so `?v=` query strings share an entry.
+// the cache name carries the build version, so a rebuild starts a fresh cache
+const serve_asset = (request, path) =>
+    caches.open(CACHE_NAME).then((cache) =>
+        cache.match(path).then(
+            (cached) => cached || fetch(request).then((r) => cache_if_ok(cache, path, r))
+        )
+    );
+
+self.addEventListener("fetch", (event) => {
+    const request = event.request;
+    if (request.method !== "GET") return;
+
+    const url = new URL(request.url);
+    if (url.origin !== self.location.origin) return;
+
+    if (ASSETS.includes(url.pathname)) {
+        event.respondWith(serve_asset(request, url.pathname));
+    }
+});
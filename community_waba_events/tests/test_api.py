@@ -0,0 +1,149 @@
+# Copyright (c) 2025, Manqala Ltd and Contributors
+# See license.txt
+
+import unittest
+from unittest.mock import patch
+
+import frappe
+
+from community_waba_events.api import distribute_item, get_participant_items, remaining_quota
+from community_waba_events.tests.utils import (
+	delete_event_data,
+	make_item,
+	make_participant,
+	make_participant_type,
+	make_user,
+	make_virtual_id,
+)
+
+EVENT = "_Test Item Event"
+STAFF = "_Test Staff"
+GUEST = "_Test Guest"
+STAFF_A = "_test_item_staff_a@example.com"
+STAFF_B = "_test_item_staff_b@example.com"
+GUEST_A = "_test_item_guest@example.com"
+OUTSIDER = "_test_item_outsider@example.com"
+ONE_PER_USER = "_Test Item One Per User"
+ONE_PER_EVENT = "_Test Item One Per Event"
+GUEST_ITEM = "_Test Item Guest"
+UNLIMITED = "_Test Item Unlimited"
+
+
+class TestParticipantItems(unittest.TestCase):
+	def setUp(self):
+		frappe.set_user("Administrator")
+		delete_event_data(EVENT)
+		for ptype in (STAFF, GUEST):
+			make_participant_type(ptype)
+		frappe.get_doc(
+			{
+				"doctype": "Community Event",
+				"event_name": EVENT,
+				"items": [
+					{"item": make_item(ONE_PER_USER), "participant_type": STAFF, "user_max": 1, "event_max": -1},
+					{"item": make_item(ONE_PER_EVENT), "participant_type": STAFF, "user_max": -1, "event_max": 1},
+					{"item": make_item(GUEST_ITEM), "participant_type": GUEST, "user_max": 1, "event_max": 1},
+					{"item": make_item(UNLIMITED), "participant_type": STAFF, "user_max": -1, "event_max": -1},
+				],
+			}
+		).insert(ignore_permissions=True)
+
+		self.vid = {}
+		for user, ptype in ((STAFF_A, STAFF), (STAFF_B, STAFF), (GUEST_A, GUEST), (OUTSIDER, None)):
+			make_user(user)
+			if ptype:
+				make_participant(EVENT, user, ptype)
+			self.vid[user] = make_virtual_id(EVENT, user)
+		frappe.db.commit()
+
+	def tearDown(self):
+		frappe.db.rollback()
+		delete_event_data(EVENT)
+
+	def get_items(self, user):
+		return {i["item"]: i for i in get_participant_items(EVENT, self.vid[user])["items"]}
+
+	def add_item_row(self, item, participant_type, user_max=-1, event_max=-1):
+		"""bypasses the event's duplicate check, like rows saved before it existed"""
+		frappe.get_doc("Community Event", EVENT).append(
+			"items",
+			{"item": item, "participant_type": participant_type, "user_max": user_max, "event_max": event_max},
+		).db_insert()
+		frappe.clear_document_cache("Community Event", EVENT)
+
+	def test_remaining_quota(self):
+		self.assertIsNone(remaining_quota(-1, 10))
+		self.assertEqual(remaining_quota(3, 1), 2)
+		self.assertEqual(remaining_quota(1, 4), 0)
+
+	def test_items_filtered_by_participant_type(self):
+		self.assertEqual(list(self.get_items(STAFF_A)), [ONE_PER_USER, ONE_PER_EVENT, UNLIMITED])
+		self.assertEqual(list(self.get_items(GUEST_A)), [GUEST_ITEM])
+
+		result = get_participant_items(EVENT, self.vid[STAFF_A])
+		self.assertEqual(result["participant"], STAFF_A)
+		self.assertEqual(result["participant_type"], STAFF)
+
+	def test_negative_max_is_unlimited(self):
+		items = self.get_items(STAFF_A)
+		self.assertIsNone(items[UNLIMITED]["user_remaining"])
+		self.assertIsNone(items[UNLIMITED]["event_remaining"])
+		self.assertTrue(items[UNLIMITED]["available"])
+		self.assertEqual(items[ONE_PER_USER]["user_remaining"], 1)
+		self.assertIsNone(items[ONE_PER_USER]["event_remaining"])
+
+	def test_exhausted_quota_is_unavailable(self):
+		distribute_item(EVENT, ONE_PER_USER, self.vid[STAFF_A])
+		distribute_item(EVENT, ONE_PER_EVENT, self.vid[STAFF_B])
+
+		items = self.get_items(STAFF_A)
+		self.assertEqual(items[ONE_PER_USER]["user_remaining"], 0)
+		self.assertFalse(items[ONE_PER_USER]["available"])
+		self.assertEqual(items[ONE_PER_EVENT]["event_remaining"], 0)
+		self.assertFalse(items[ONE_PER_EVENT]["available"])
+		self.assertTrue(items[UNLIMITED]["available"])
+
+		items = self.get_items(STAFF_B)
+		self.assertTrue(items[ONE_PER_USER]["available"])
+		self.assertFalse(items[ONE_PER_EVENT]["available"])
+
+		# guests have their own event quota
+		self.assertTrue(self.get_items(GUEST_A)[GUEST_ITEM]["available"])
+
+	def test_distribute_item_rejects_exceeded_quota(self):
+		distribute_item(EVENT, ONE_PER_USER, self.vid[STAFF_A])
+		self.assertRaises(frappe.ValidationError, distribute_item, EVENT, ONE_PER_USER, self.vid[STAFF_A])
+
+		distribute_item(EVENT, ONE_PER_EVENT, self.vid[STAFF_A])
+		self.assertRaises(frappe.ValidationError, distribute_item, EVENT, ONE_PER_EVENT, self.vid[STAFF_B])
+
+		# not eligible for the participant type
+		self.assertRaises(frappe.ValidationError, distribute_item, EVENT, GUEST_ITEM, self.vid[STAFF_A])
+
+		self.assertEqual(frappe.db.count("Community Event Item Receipt", {"event": EVENT}), 2)
+
+	def test_unregistered_or_invalid_virtual_id(self):
+		self.assertRaises(frappe.ValidationError, get_participant_items, EVENT, self.vid[OUTSIDER])
+		self.assertRaises(frappe.ValidationError, get_participant_items, EVENT, "_test-missing-virtual-id")
+
+	def test_duplicate_item_rows_return_one_entry(self):
+		self.add_item_row(ONE_PER_USER, STAFF, user_max=5)
+
+		items = get_participant_items(EVENT, self.vid[STAFF_A])["items"]
+		self.assertEqual([i["item"] for i in items], [ONE_PER_USER, ONE_PER_EVENT, UNLIMITED])
+		# the row distribute_item enforces
+		self.assertEqual(items[0]["user_max"], 1)
+
+	def test_query_count_does_not_grow_with_items(self):
+		def count_queries():
+			# warm the event doc cache, then count
+			get_participant_items(EVENT, self.vid[STAFF_A])
+			with patch.object(frappe.local.db, "sql", wraps=frappe.local.db.sql) as sql:
+				get_participant_items(EVENT, self.vid[STAFF_A])
+			return sql.call_count
+
+		before = count_queries()
+		for i in range(10):
+			self.add_item_row(make_item(f"_Test Item Extra {i}"), STAFF)
+		self.assertEqual(len(self.get_items(STAFF_A)), 13)
+		self.assertEqual(count_queries(), before)
@@ -0,0 +1,146 @@
+# Copyright (c) 2025, Manqala Ltd and Contributors
+# See license.txt
+
+import unittest
+from unittest.mock import patch
+
+import frappe
+
+from community_waba_events import replica
+from community_waba_events.api import get_event_items
+
+
+def current_db():
+	return frappe.local.db
+
+
+@unittest.skipUnless(frappe.conf.read_from_replica, "read_from_replica not configured")
+class TestReplicaRouting(unittest.TestCase):
+	"""needs a second mariadb instance replicating the site database, configured
+	with `read_from_replica: 1` and `replica_host` in site_config.json"""
+
+	def setUp(self):
+		frappe.cache().delete_value(replica.last_write_key())
+		replica.reset_stats()
+
+	def test_replica_lag_is_measured(self):
+		frappe.cache().delete_value(replica.LAG_KEY)
+		self.assertIsNotNone(replica.replica_lag())
+
+	def test_read_only_uses_replica(self):
+		primary = frappe.local.db
+		used = replica.read_only()(current_db)()
+		self.assertIsNot(used, primary)
+		self.assertEqual(used.host, frappe.conf.replica_host)
+		self.assertIs(frappe.local.db, primary)
+
+	def test_recent_write_falls_back_to_primary(self):
+		primary = frappe.local.db
+		replica.mark_write()
+		self.assertIs(replica.read_only(read_your_writes=True)(current_db)(), primary)
+		self.assertIsNot(replica.read_only()(current_db)(), primary)
+
+	def test_stats(self):
+		replica.read_only()(current_db)()
+		replica.mark_write()
+		replica.read_only(read_your_writes=True)(current_db)()
+		stats = replica.get_stats()
+		self.assertEqual(stats["endpoints"]["current_db"], {"replica": 1, "primary": 1, "replica_share": 0.5})
+		self.assertEqual(stats["total"]["replica_share"], 0.5)
+
+
+class TestReplicaRoutingWithoutReplica(unittest.TestCase):
+	"""routing decisions and metrics that don't need a second database"""
+
+	def setUp(self):
+		frappe.cache().delete_value(replica.last_write_key())
+		replica.reset_stats()
+
+	def tearDown(self):
+		replica.reset_stats()
+
+	def test_stats_are_recorded(self):
+		with patch.dict(frappe.local.conf, {"read_from_replica": 0}):
+			replica.read_only()(current_db)()
+			replica.read_only()(current_db)()
+		stats = replica.get_stats()
+		self.assertEqual(stats["endpoints"]["current_db"], {"replica": 0, "primary": 2, "replica_share": 0.0})
+		self.assertEqual(stats["total"]["primary"], 2)
+
+	def test_lagging_replica_falls_back_to_primary(self):
+		with patch.dict(frappe.local.conf, {"read_from_replica": 1, "replica_lag_threshold": 5}):
+			for lag, expected in ((0, True), (5, True), (30, False), (None, False)):
+				with patch.object(replica, "replica_lag", return_value=lag):
+					self.assertEqual(replica.use_replica(), expected, lag)
+
+			with patch.object(replica, "replica_lag", return_value=0):
+				replica.mark_write()
+				self.assertFalse(replica.use_replica(read_your_writes=True))
+				self.assertTrue(replica.use_replica())
+
+	def test_recent_write_is_per_user(self):
+		with patch.dict(frappe.local.conf, {"replica_lag_threshold": 5}):
+			replica.mark_write()
+			self.assertTrue(replica.recently_wrote())
+			self.assertFalse(replica.recently_wrote("Guest"))
+			with patch.object(replica.time, "time", return_value=replica.time.time() + 10):
+				self.assertFalse(replica.recently_wrote())
+
+	def test_missing_record_is_retried_on_primary(self):
+		calls = []
+
+		def get_virtual_id():
+			calls.append(current_db())
+			if len(calls) == 1:
+				frappe.throw("not replicated yet", frappe.DoesNotExistError)
+			return "found"
+
+		fn = replica.read_only(retry_on_primary=frappe.DoesNotExistError)(get_virtual_id)
+		with patch.object(replica, "use_replica", return_value=True):
+			self.assertEqual(fn(), "found")
+			self.assertEqual(len(calls), 2)
+			self.assertEqual(
+				replica.get_stats()["endpoints"]["get_virtual_id"],
+				{"replica": 1, "primary": 1, "replica_share": 0.5},
+			)
+
+			# without retry_on_primary the error is raised
+			calls.clear()
+			self.assertRaises(frappe.DoesNotExistError, replica.read_only()(get_virtual_id))
+			self.assertEqual(len(calls), 1)
+
+		fn.on_primary()
+		self.assertEqual(replica.get_stats()["endpoints"]["get_virtual_id"]["primary"], 2)
+		self.assertEqual(len(calls), 2)
+
+	def test_unreadable_replica_status_is_logged_once(self):
+		frappe.cache().delete_value(replica.LAG_ERROR_KEY)
+		try:
+			with patch.object(frappe, "log_error") as log_error:
+				with patch.object(replica, "get_replica_status", side_effect=Exception("denied")):
+					self.assertIsNone(replica.measure_replica_lag())
+					self.assertIsNone(replica.measure_replica_lag())
+				self.assertEqual(log_error.call_count, 1)
+
+				with patch.object(replica, "get_replica_status", return_value=[{"Seconds_Behind_Master": 2}]):
+					self.assertEqual(replica.measure_replica_lag(), 2.0)
+
+				# logged again once a failure follows a successful read
+				with patch.object(replica, "get_replica_status", side_effect=Exception("denied")):
+					replica.measure_replica_lag()
+				self.assertEqual(log_error.call_count, 2)
+		finally:
+			frappe.cache().delete_value(replica.LAG_ERROR_KEY)
+
+	def test_get_event_items_with_positional_args(self):
+		# frappe's search widget passes the search arguments positionally
+		item = "_Test Replica Item"
+		if not frappe.db.exists("Community Event Item", item):
+			frappe.get_doc({"doctype": "Community Event Item", "item_name": item}).insert(
+				ignore_permissions=True
+			)
+		try:
+			results = get_event_items("Community Event Item", "_Test Replica", "name", 0, 20, {})
+			self.assertIn(item, [row[0] for row in results])
+		finally:
+			frappe.delete_doc("Community Event Item", item, ignore_permissions=True, force=True)
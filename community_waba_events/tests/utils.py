@@ -0,0 +1,97 @@
+# Copyright (c) 2025, Manqala Ltd and Contributors
+# See license.txt
+
+"""fixtures shared by the app's tests"""
+
+import frappe
+from frappe.utils import get_datetime
+
+
+def make_event(event_name):
+	if not frappe.db.exists("Community Event", event_name):
+		frappe.get_doc({"doctype": "Community Event", "event_name": event_name}).insert(
+			ignore_permissions=True
+		)
+	return event_name
+
+
+def make_user(email):
+	if not frappe.db.exists("User", email):
+		frappe.get_doc(
+			{"doctype": "User", "email": email, "first_name": email.split("@")[0], "send_welcome_email": 0}
+		).insert(ignore_permissions=True)
+	return email
+
+
+def make_participant(event, community_user, participant_type=None):
+	if not frappe.db.exists("Community Event Participant", community_user):
+		frappe.get_doc(
+			{
+				"doctype": "Community Event Participant",
+				"community_user": community_user,
+				"community_event": event,
+				"participant_type": participant_type,
+			}
+		).insert(ignore_permissions=True)
+	return community_user
+
+
+def make_participant_type(participant_type):
+	if not frappe.db.exists("Community Event Participant Type", participant_type):
+		frappe.get_doc(
+			{"doctype": "Community Event Participant Type", "participant_type": participant_type}
+		).insert(ignore_permissions=True)
+	return participant_type
+
+
+def make_item(item_name):
+	if not frappe.db.exists("Community Event Item", item_name):
+		frappe.get_doc({"doctype": "Community Event Item", "item_name": item_name}).insert(
+			ignore_permissions=True
+		)
+	return item_name
+
+
+def make_virtual_id(event, user):
+	"""Virtual ID owned by `user`, insert always sets the owner to the session user"""
+	doc = frappe.get_doc({"doctype": "Virtual ID", "context": "Community Event", "estate": event}).insert(
+		ignore_permissions=True, ignore_mandatory=True, ignore_links=True
+	)
+	frappe.db.set_value("Virtual ID", doc.name, "owner", user, update_modified=False)
+	return doc.name
+
+
+def make_score(event, participant, score, creation):
+	"""score backdated to `creation`
+
+	insert always stamps the current time, and the score's rollups are added
+	for that time, call rebuild_rollups once the scores are committed"""
+	doc = frappe.get_doc(
+		{
+			"doctype": "Community Event Activity Score",
+			"event": event,
+			"participant": participant,
+			"score": score,
+			"reference": frappe.generate_hash(length=20),
+		}
+	).insert(ignore_permissions=True)
+	frappe.db.set_value(doc.doctype, doc.name, "creation", creation, update_modified=False)
+	doc.creation = get_datetime(creation)
+	return doc
+
+
+def delete_event_data(event):
+	"""remove everything the tests created for the event, committed"""
+	for doctype in (
+		"Community Event Activity Score",
+		"Community Event Activity Score Rollup",
+		"Community Event Leaderboard Broadcast",
+		"Community Event Item Receipt",
+	):
+		frappe.db.delete(doctype, {"event": event})
+	frappe.db.delete("Virtual ID", {"estate": event})
+	frappe.db.delete("Community Event Participant", {"community_event": event})
+	for child in ("Community Event Items", "Community Event Admins"):
+		frappe.db.delete(child, {"parent": event, "parenttype": "Community Event"})
+	frappe.db.delete("Community Event", {"name": event})
+	frappe.db.commit()